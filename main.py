@@ -1,5 +1,8 @@
 __author__ = "Valentin Bakin"
 
+import queue
+import threading
+from functools import partial
 import cv2
 from utils.pose_detection import PoseDetector
 from utils.face_detection import FaceMeshDetector
@@ -9,39 +12,118 @@ from rig.animator import animate_rig
 from data.landmark_structure import landmarks
 
 
-# Initialize detectors
-pose_detector = PoseDetector()
-face_detector = FaceMeshDetector()
-hand_detector = HandDetector()
+# Detectors are created on first use and cached, so only the MediaPipe graphs
+# actually used by the loop get loaded. Face and hand inference runs on a
+# half-resolution frame: this trades some landmark accuracy for speed, since the
+# landmark models crop the face/hand region from that smaller frame. Use
+# inference_scale=1.0 to run them at full resolution.
+DETECTOR_TYPES = {
+    'pose': PoseDetector,
+    'face': partial(FaceMeshDetector, inference_scale=0.5),
+    'hands': partial(HandDetector, inference_scale=0.5)
+}
+_detectors = {}
 
 
-def main():
-    cap = initialize_camera()
+def get_detector(name):
+    detector = _detectors.get(name)
+    if detector is None:
+        detector = DETECTOR_TYPES[name]()
+        _detectors[name] = detector
+    return detector
 
-    while cap.isOpened():
-        success, img = cap.read()
-        if not success:
-            break
 
-        # img = process_pose(img, pose_detector)
-        # img = process_face(img, face_detector)
-        img = process_hands(img, hand_detector)
+def main():
+    # Keep OpenCV's internal thread pool small so it doesn't compete with MediaPipe for cores
+    cv2.setNumThreads(2)
+    cap = initialize_camera()
 
-        display_frame(img)
+    # Capture and detection each run on their own thread and hand over only the newest item,
+    # so a slow detector drops frames instead of falling behind the camera and the main
+    # thread is left free for imshow/waitKey
+    frames = queue.Queue(maxsize=1)
+    results = queue.Queue(maxsize=1)
+    stop_event = threading.Event()
+    capture_thread = threading.Thread(target=capture_frames, args=(cap, frames, stop_event), daemon=True)
+    detection_thread = threading.Thread(target=detect_frames, args=(frames, results, stop_event), daemon=True)
+    capture_thread.start()
+    detection_thread.start()
+
+    window_shown = False
+    while True:
+        # Wait for a result with a timeout so the window keeps handling events (Esc, close)
+        # even when no frame is ready
+        try:
+            img = results.get(timeout=0.05)
+        except queue.Empty:
+            pass
+        else:
+            if img is None:
+                break
+            display_frame(img)
+            window_shown = True
 
         if cv2.waitKey(1) & 0xFF == 27:
             break
-        if cv2.getWindowProperty("AniMate", cv2.WND_PROP_VISIBLE) < 1:
+        if window_shown and cv2.getWindowProperty("AniMate", cv2.WND_PROP_VISIBLE) < 1:
             break
 
+    # Stopping capture sends the end-of-stream marker on to the detection thread
+    stop_event.set()
+    capture_thread.join()
+    detection_thread.join()
     cap.release()
     cv2.destroyAllWindows()
 
 
+def put_latest(q, item):
+    # Replace whatever is waiting in a one-slot queue so the consumer always gets the newest item
+    try:
+        q.get_nowait()
+    except queue.Empty:
+        pass
+    q.put_nowait(item)
+
+
+def capture_frames(cap, frames, stop_event):
+    try:
+        while cap.isOpened() and not stop_event.is_set():
+            success, img = cap.read()
+            if not success:
+                break
+            put_latest(frames, img)
+    finally:
+        # None tells the consumer the stream has ended, also when reading failed
+        put_latest(frames, None)
+
+
+def detect_frames(frames, results, stop_event):
+    try:
+        while True:
+            img = frames.get()
+            if img is None:
+                break
+
+            # img = process_pose(img, get_detector('pose'))
+            # img = process_face(img, get_detector('face'))
+            img = process_hands(img, get_detector('hands'))
+
+            put_latest(results, img)
+    finally:
+        # If a detector fails, stop capture too and still let the display loop finish
+        stop_event.set()
+        put_latest(results, None)
+
+
 def initialize_camera(width=1280, height=720):
     cap = cv2.VideoCapture(0)
-    cap.set(3, width)
-    cap.set(4, height)
+    # MJPG lets the camera/driver do the decoding instead of a per-frame YUYV->BGR conversion on the CPU;
+    # set it before the resolution since some backends reset the format on size changes
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    # Keep only the newest frame buffered so read() doesn't hand back stale frames
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     return cap
 
 
@@ -6,6 +6,7 @@ Contains:
 - pose_detection: Functions for pose detection and landmark capture
 - face_detection: Functions for face detection and landmark capture
 - hand_detection: Functions for hand detection and landmark capture
+- image_utils: Helpers for preparing frames for MediaPipe
 
 """
 
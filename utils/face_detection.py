@@ -1,8 +1,16 @@
 __author__ = "Valentin Bakin"
 
+import logging
 import cv2
 import mediapipe as mp
 import time
+if __package__:
+    from utils.image_utils import process_frame
+else:
+    # Run directly (python utils/face_detection.py): utils/ itself is on sys.path
+    from image_utils import process_frame
+
+logger = logging.getLogger(__name__)
 
 
 class FaceMeshDetector:
@@ -10,12 +18,21 @@ class FaceMeshDetector:
                  num_faces=1,
                  refine_landmarks=False,
                  min_detection_confidence=0.5,
-                 min_tracking_confidence=0.5):
+                 min_tracking_confidence=0.5,
+                 inference_scale=1.0):
+        # Downscale and RGB scratch buffers reused across frames (reallocated only when the frame size changes)
+        self._small = None
+        self._rgb = None
         self.static_image_mode = static_mode
         self.max_num_faces = num_faces
         self.refine_landmarks = refine_landmarks
         self.min_detection_confidence = min_detection_confidence
         self.min_tracking_confidence = min_tracking_confidence
+        # Factor applied to the frame before inference (landmarks are normalized, so drawing is unaffected).
+        # Only downscaling is supported, and very small factors leave too few pixels for the landmark models
+        if not 0.1 <= inference_scale <= 1.0:
+            raise ValueError(f"inference_scale must be between 0.1 and 1.0, got {inference_scale}")
+        self.inference_scale = inference_scale
 
         self.mp_faceMesh = mp.solutions.face_mesh
         self.mp_draw = mp.solutions.drawing_utils
@@ -27,25 +44,25 @@ class FaceMeshDetector:
         self.draw_specs = self.mp_draw.DrawingSpec(thickness=1, circle_radius=1, color=(0, 255, 0))
 
     def find_face_mesh(self, img, draw=True):
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        results = self.face_detection.process(img_rgb)
+        # Downscale if requested, convert to RGB in the reusable buffers and run the face mesh
+        results, self._rgb, self._small = process_frame(self.face_detection.process, img, self._rgb,
+                                                        self.inference_scale, self._small)
         faces = []
         if results.multi_face_landmarks:
+            ih, iw, ic = img.shape  # Image dimensions are the same for every face and landmark
 
             for face_lms in results.multi_face_landmarks:
                 if draw:
                     self.mp_draw.draw_landmarks(img, face_lms, self.mp_faceMesh.FACEMESH_CONTOURS,
                                                 landmark_drawing_spec=self.draw_specs)
-                    face = []
-                    for id, lm in enumerate(face_lms.landmark):
-                        ih, iw, ic = img.shape
-                        x, y = int(lm.x * iw), int(lm.y * ih)
-                        face.append([x, y])
-                        # Display id number of every dot
-                        # cv2.putText(img, f'{str(id)}', (x, y), cv2.FONT_HERSHEY_PLAIN,
-                        #             0.5, (0, 255, 0), 1)
-
-                    faces.append(face)
+                # Convert normalized coordinates to [x, y] pixel coordinates
+                face = [[int(lm.x * iw), int(lm.y * ih)] for lm in face_lms.landmark]
+                # Display id number of every dot
+                # for id, (x, y) in enumerate(face):
+                #     cv2.putText(img, f'{str(id)}', (x, y), cv2.FONT_HERSHEY_PLAIN,
+                #                 0.5, (0, 255, 0), 1)
+
+                faces.append(face)
         return img, faces
 
 
@@ -60,9 +77,11 @@ def main():
 
     while True:
         success, img = cap.read()
+        if not success:
+            break
         img, faces = detector.find_face_mesh(img)
         if len(faces) != 0:
-            print(len(faces[0]))
+            logger.debug("Face landmarks: %d", len(faces[0]))
         c_time = time.time()
         fps = 1 / (c_time - p_time)
         p_time = c_time
@@ -70,7 +89,6 @@ def main():
                     3, (0, 255, 0), 2)
 
         cv2.imshow("Face detection test", img)
-        cv2.waitKey(1)
 
         # Break the loop if 'Esc' key is pressed
         if cv2.waitKey(1) & 0xFF == 27:
@@ -79,6 +97,10 @@ def main():
         if cv2.getWindowProperty("Face detection test", cv2.WND_PROP_VISIBLE) < 1:
             break
 
+    # Release the video capture object and close all OpenCV windows
+    cap.release()
+    cv2.destroyAllWindows()
+
 
 if __name__ == "__main__":
     main()
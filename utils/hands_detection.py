@@ -2,9 +2,17 @@ __author__ = "Valentin Bakin"
 
 import math
 from typing import List
+import logging
 import cv2
 import mediapipe as mp
 import time
+if __package__:
+    from utils.image_utils import process_frame
+else:
+    # Run directly (python utils/hands_detection.py): utils/ itself is on sys.path
+    from image_utils import process_frame
+
+logger = logging.getLogger(__name__)
 
 
 class HandDetector:
@@ -13,14 +21,23 @@ class HandDetector:
                  num_hands=2,
                  complexity=1,
                  detection_confidence=0.5,
-                 tracking_confidence=0.5):
+                 tracking_confidence=0.5,
+                 inference_scale=1.0):
         # Initialize variables and MediaPipe hand detection module
         self.results = None
+        # Downscale and RGB scratch buffers reused across frames (reallocated only when the frame size changes)
+        self._small = None
+        self._rgb = None
         self.mode = mode
         self.num_hands = num_hands
         self.complexity = complexity
         self.detection_confidence = detection_confidence
         self.tracking_confidence = tracking_confidence
+        # Factor applied to the frame before inference (landmarks are normalized, so drawing is unaffected).
+        # Only downscaling is supported, and very small factors leave too few pixels for the landmark models
+        if not 0.1 <= inference_scale <= 1.0:
+            raise ValueError(f"inference_scale must be between 0.1 and 1.0, got {inference_scale}")
+        self.inference_scale = inference_scale
 
         # Set up MediaPipe hands module
         self.mpHands = mp.solutions.hands
@@ -29,12 +46,13 @@ class HandDetector:
         # Set up drawing utilities for hand landmarks
         self.mpDraw = mp.solutions.drawing_utils
         self.tip_ids = [4, 8, 12, 16, 20]
+        # (tip, pip) landmark index pairs for the four non-thumb fingers, resolved once
+        self.finger_pairs = [(tip_id, tip_id - 2) for tip_id in self.tip_ids[1:]]
 
     def find_hands(self, img, draw=True):
-        # Convert the image from BGR to RGB
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        # Process the RGB image to detect hands
-        self.results = self.hands.process(imgRGB)
+        # Downscale if requested, convert to RGB in the reusable buffers and process the frame to detect hands
+        self.results, self._rgb, self._small = process_frame(self.hands.process, img, self._rgb,
+                                                             self.inference_scale, self._small)
 
         # Draw hand landmarks if any are detected and draw is True
         if self.results.multi_hand_landmarks:
@@ -51,13 +69,11 @@ class HandDetector:
             # Select the specified hand
             my_hand = self.results.multi_hand_landmarks[hand_no]
             h, w, c = img.shape  # Get image dimensions
-            # Iterate through each landmark in the hand
-            for lm_id, lm in enumerate(my_hand.landmark):
-                # Convert normalized coordinates to pixel coordinates
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                self.lm_list.append([lm_id, cx, cy])
-                # Draw a circle at the landmark if draw is True
-                if draw:
+            # Convert normalized coordinates to pixel coordinates
+            self.lm_list = [[lm_id, int(lm.x * w), int(lm.y * h)] for lm_id, lm in enumerate(my_hand.landmark)]
+            # Draw a circle at each landmark if draw is True
+            if draw:
+                for _, cx, cy in self.lm_list:
                     cv2.circle(img, (cx, cy), point_radius, (255, 0, 255), cv2.FILLED)
         return self.lm_list
 
@@ -70,8 +86,8 @@ class HandDetector:
         else:
             fingers.append(0)
         # Rest fingers (only for right hand for now)
-        for f_id in range(1, 5):
-            if self.lm_list[self.tip_ids[f_id]][2] < self.lm_list[self.tip_ids[f_id] - 2][2]:
+        for tip_id, pip_id in self.finger_pairs:
+            if self.lm_list[tip_id][2] < self.lm_list[pip_id][2]:
                 fingers.append(1)
             else:
                 fingers.append(0)
@@ -111,7 +127,7 @@ def main():
         # Get the positions of hand landmarks
         lm_list = detector.find_position(img, 0, False)
         if lm_list:
-            print(lm_list[4])  # Print the position of landmark 4 (tip of the thumb)
+            logger.debug("Thumb tip: %s", lm_list[4])  # Position of landmark 4 (tip of the thumb)
         # Calculate FPS
         c_time = time.time()
         fps = 1 / (c_time - p_time)
@@ -0,0 +1,38 @@
+__author__ = "Valentin Bakin"
+
+import cv2
+import numpy as np
+
+
+def bgr_to_rgb(img, buffer=None):
+    # Convert into the given buffer, reallocating it only when the frame size changes.
+    # Returns the buffer holding the RGB image so callers can keep it for the next frame.
+    if buffer is None or buffer.shape != img.shape:
+        buffer = np.empty_like(img)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=buffer)
+
+
+def downscale(img, scale, buffer=None):
+    # Resize by the given factor into the given buffer, reallocating it only when the target size changes.
+    # The target size is rounded the same way cv2.resize rounds fx/fy.
+    h, w = img.shape[:2]
+    size = (round(w * scale), round(h * scale))
+    shape = (size[1], size[0]) + img.shape[2:]
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=img.dtype)
+    return cv2.resize(img, size, dst=buffer, interpolation=cv2.INTER_AREA)
+
+
+def process_frame(process, img, rgb_buffer=None, scale=1.0, small_buffer=None):
+    # Downscale (when scale != 1.0) and convert to RGB into the given buffers, then run `process` on the RGB frame.
+    # The frame is read-only during the call so MediaPipe takes it by reference instead of copying, and is made
+    # writeable again even if `process` raises. Returns (results, rgb_buffer, small_buffer) for reuse next frame.
+    if scale != 1.0:
+        small_buffer = img = downscale(img, scale, small_buffer)
+    rgb_buffer = bgr_to_rgb(img, rgb_buffer)
+    rgb_buffer.flags.writeable = False
+    try:
+        results = process(rgb_buffer)
+    finally:
+        rgb_buffer.flags.writeable = True
+    return results, rgb_buffer, small_buffer
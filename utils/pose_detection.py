@@ -1,10 +1,19 @@
 __author__ = "Valentin Bakin"
 
 import csv
+import logging
 import cv2
 import mediapipe as mp
+import numpy as np
 import time
 import math
+if __package__:
+    from utils.image_utils import process_frame
+else:
+    # Run directly (python utils/pose_detection.py): utils/ itself is on sys.path
+    from image_utils import process_frame
+
+logger = logging.getLogger(__name__)
 
 
 class PoseDetector:
@@ -18,6 +27,8 @@ class PoseDetector:
                  tracking_confidence=0.5):
 
         self.results = None
+        # RGB scratch buffer reused across frames (reallocated only when the frame size changes)
+        self._rgb = None
         self.mode = mode
         self.complexity = complexity
         self.smooth_landmarks = smooth_landmarks
@@ -41,6 +52,9 @@ class PoseDetector:
             min_tracking_confidence=self.tracking_confidence
         )
 
+        # Drawing specs keyed by (color, radius), built once instead of on every draw call
+        self._draw_spec_cache = {}
+
         # Initialize dictionaries to store landmark positions
         self.body_landmarks = []
         self.face_landmarks = []
@@ -48,67 +62,73 @@ class PoseDetector:
         self.right_hand_landmarks = []
 
     def find_pose(self, img, draw=True):
-        # Convert the BGR image to RGB
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        # Convert the BGR image to RGB in the reusable buffer and process it with the Holistic model
+        self.results, self._rgb, _ = process_frame(self.holistic.process, img, self._rgb)
 
-        # Process the RGB image with the Holistic model
-        self.results = self.holistic.process(img_rgb)
+        # Nothing to draw or convert when no body is visible; clear the previous frame's body
+        # so find_angle doesn't measure stale positions
+        if not self.results.pose_landmarks:
+            self.body_landmarks = []
+            return img
 
-        # Draw pose landmarks
-
-        if self.results.pose_landmarks:
-            if draw:
-                self.draw_landmarks(img, self.results.pose_landmarks, self.mp_holistic.POSE_CONNECTIONS, (255, 0, 0),
-                                    draw)
+        # Draw and store pose landmarks
+        if draw:
+            self.draw_landmarks(img, self.results.pose_landmarks, self.mp_holistic.POSE_CONNECTIONS, (255, 0, 0),
+                                draw)
         self.store_landmarks(img, self.results.pose_landmarks, 'body')
 
         return img
 
     def find_face(self, img, draw=True):
-        # Process the RGB image with the Holistic model (removed redundant code)
-        results = self.holistic.process(img)  # Use the processed image directly
-        if draw:
-            if results.face_landmarks:
-                self.draw_landmarks(img, results.face_landmarks, None, (0, 255, 0), draw, radius=2)
-                self.store_landmarks(img, results.face_landmarks, 'face')
+        # Reuse the Holistic results from find_pose instead of running the model again.
+        # Clear the previous frame's face when none is visible, as find_pose does for the body
+        if not (self.results and self.results.face_landmarks):
+            self.face_landmarks = []
+            return img
+
+        self.draw_landmarks(img, self.results.face_landmarks, None, (0, 255, 0), draw, radius=2)
+        self.store_landmarks(img, self.results.face_landmarks, 'face')
 
         return img
 
     def find_left_hand(self, img, draw=True):
-        # Process the RGB image with the Holistic model (removed redundant code)
-        results = self.holistic.process(img)  # Use the processed image directly
-        if draw:
-            if results.left_hand_landmarks:
-                self.draw_landmarks(img, results.left_hand_landmarks, self.mp_holistic.HAND_CONNECTIONS, (0, 0, 255),
-                                    draw)
-                self.store_landmarks(img, results.left_hand_landmarks, 'left_hand')
+        # Reuse the Holistic results from find_pose instead of running the model again.
+        # Clear the previous frame's left hand when none is visible, as find_pose does for the body
+        if not (self.results and self.results.left_hand_landmarks):
+            self.left_hand_landmarks = []
+            return img
+
+        self.draw_landmarks(img, self.results.left_hand_landmarks, self.mp_holistic.HAND_CONNECTIONS, (0, 0, 255),
+                            draw)
+        self.store_landmarks(img, self.results.left_hand_landmarks, 'left_hand')
 
         return img
 
     def find_right_hand(self, img, draw=True):
-        # Process the RGB image with the Holistic model (removed redundant code)
-        results = self.holistic.process(img)  # Use the processed image directly
-        if draw:
-            if results.right_hand_landmarks:
-                self.draw_landmarks(img, results.right_hand_landmarks, self.mp_holistic.HAND_CONNECTIONS, (255, 0, 0),
-                                    draw)
-                self.store_landmarks(img, results.right_hand_landmarks, 'right_hand')
+        # Reuse the Holistic results from find_pose instead of running the model again.
+        # Clear the previous frame's right hand when none is visible, as find_pose does for the body
+        if not (self.results and self.results.right_hand_landmarks):
+            self.right_hand_landmarks = []
+            return img
+
+        self.draw_landmarks(img, self.results.right_hand_landmarks, self.mp_holistic.HAND_CONNECTIONS, (255, 0, 0),
+                            draw)
+        self.store_landmarks(img, self.results.right_hand_landmarks, 'right_hand')
 
         return img
 
     def draw_landmarks(self, img, landmarks, connections, color, draw=True, radius=4):
         if draw:
-            self.mp_draw.draw_landmarks(img, landmarks, connections,
-                                        landmark_drawing_spec=self.mp_draw.DrawingSpec(color=color, thickness=1,
-                                                                                       circle_radius=radius))
+            draw_spec = self._draw_spec_cache.get((color, radius))
+            if draw_spec is None:
+                draw_spec = self.mp_draw.DrawingSpec(color=color, thickness=1, circle_radius=radius)
+                self._draw_spec_cache[(color, radius)] = draw_spec
+            self.mp_draw.draw_landmarks(img, landmarks, connections, landmark_drawing_spec=draw_spec)
 
     def store_landmarks(self, img, landmarks, part) -> list:
-        lm_list = []
         h, w, c = img.shape  # Get image dimensions
 
-        for lm_id, lm in enumerate(landmarks.landmark):
-            cx, cy = int(lm.x * w), int(lm.y * h)
-            lm_list.append([lm_id, cx, cy])
+        lm_list = [[lm_id, int(lm.x * w), int(lm.y * h)] for lm_id, lm in enumerate(landmarks.landmark)]
 
         # Store landmarks based on part
         if part == 'body':
@@ -132,27 +152,23 @@ class PoseDetector:
 
     @staticmethod
     def write_landmarks_to_csv(landmarks, filename='landmarks.csv'):
-        with open(filename, mode='w', newline='') as file:
-            fieldnames = ['Part', 'ID', 'X', 'Y']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
+        def rows():
             for part, lm_lists in landmarks.items():
                 for lm in lm_lists:
                     if len(lm) == 3:  # Ensure lm has exactly three elements [lm_id, x, y]
-                        lm_id, x, y = lm  # Unpack lm [lm_id, x, y]
-                        writer.writerow({
-                            'Part': part,
-                            'ID': lm_id,
-                            'X': x,
-                            'Y': y
-                        })
-                        # print(f"Writing: Part={part}, ID={lm_id}, X={x}, Y={y}")  # Debug print
+                        yield (part, *lm)
                     else:
-                        print(f"Skipping invalid landmark format: {lm}")
+                        logger.warning("Skipping invalid landmark format: %s", lm)
+
+        with open(filename, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Part', 'ID', 'X', 'Y'])
+            # Stream all rows through one writerows call instead of building a dict per row
+            writer.writerows(rows())
 
     def find_angle(self, img, p1, p2, p3, draw=True):
-        lm_dict = self.get_all_landmarks()
-        body_landmarks = lm_dict.get('body', [])
+        # Read the body landmarks directly rather than building the full landmarks dict on every call
+        body_landmarks = self.body_landmarks
         angle = None
 
         # Check if the body landmarks list is not empty and contains the necessary points
@@ -163,14 +179,14 @@ class PoseDetector:
             x3, y3 = body_landmarks[p3][1:]
 
             # Calculate the angle
+            # Wrap into [0, 360) with a modulo instead of a branch
             angle = math.degrees(math.atan2(y3 - y2, x3 - x2) -
-                                 math.atan2(y1 - y2, x1 - x2))
-            if angle < 0:
-                angle += 360
+                                 math.atan2(y1 - y2, x1 - x2)) % 360
 
             if draw:
-                cv2.line(img, (x1, y1), (x2, y2), (255, 255, 255), 3)
-                cv2.line(img, (x3, y3), (x2, y2), (255, 255, 255), 3)
+                # Draw both segments as a single open polyline through the middle joint
+                cv2.polylines(img, [np.array([(x1, y1), (x2, y2), (x3, y3)], dtype=np.int32)], False,
+                              (255, 255, 255), 3)
 
                 cv2.circle(img, (x1, y1), 10, (0, 0, 255), cv2.FILLED)
                 cv2.circle(img, (x1, y1), 15, (0, 0, 255), 3)
@@ -183,7 +199,7 @@ class PoseDetector:
                 #             cv2.FONT_HERSHEY_PLAIN, 2, (0, 255, 0), 2)
                 # print(f'Print angle from find_angle func {angle}')
         else:
-            print("Insufficient body landmarks to calculate angle")
+            logger.debug("Insufficient body landmarks to calculate angle")
 
         return angle
 
@@ -200,24 +216,17 @@ def main():
         if not success:
             break
 
-        # Flip the image horizontally to mirror it
-        img = cv2.flip(img, 1)
-        # Process the image once and reuse the processed image
-        processed_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        # Flip the image horizontally in place to mirror it
+        cv2.flip(img, 1, dst=img)
 
-        # Detect pose and draw landmarks
-        pose_detector.find_pose(processed_img)
+        # Detect pose and draw landmarks (find_pose does the BGR->RGB conversion into its own buffer)
+        pose_detector.find_pose(img)
         # Detect face and draw landmarks
-        pose_detector.find_face(processed_img)
+        pose_detector.find_face(img)
         # Detect and draw left hand landmarks
-        pose_detector.find_left_hand(processed_img)
+        pose_detector.find_left_hand(img)
         # Detect and draw right hand landmarks
-        pose_detector.find_right_hand(processed_img)
-
-        lm_list = pose_detector.get_all_landmarks()
-
-        # Convert processed image back to BGR for display
-        img = cv2.cvtColor(processed_img, cv2.COLOR_RGB2BGR)
+        pose_detector.find_right_hand(img)
 
         # Calculate and display FPS
         c_time = time.time()
@@ -230,11 +239,11 @@ def main():
 
         # Break the loop if 'Esc' key is pressed
         if cv2.waitKey(1) & 0xFF == 27:
-            PoseDetector.write_landmarks_to_csv(lm_list)
+            PoseDetector.write_landmarks_to_csv(pose_detector.get_all_landmarks())
             break
         # Check if the window is closed by looking if any windows are still open
         if cv2.getWindowProperty("Pose detection test", cv2.WND_PROP_VISIBLE) < 1:
-            PoseDetector.write_landmarks_to_csv(lm_list)
+            PoseDetector.write_landmarks_to_csv(pose_detector.get_all_landmarks())
             break
 
     cap.release()